@@ -3,8 +3,10 @@
 #  业绩与绩效奖励统计程序 (网页版 V2 - 使用Session State)
 # ==============================================================================
 import streamlit as st
-import json
+import orjson
 import os
+import functools
+import numpy as np
 import pandas as pd
 
 # --- 配置 ---
@@ -21,86 +23,174 @@ class Config:
 
 
 # --- 数据加载/保存函数 ---
+# 记录按列存储(SoA)：月份是[START_MONTH, END_MONTH]内的稠密小整数区间，
+# 直接用月份做下标索引两个定长float64数组加一个"已录入"布尔掩码，
+# 所有聚合都变成NumPy的C层归约，内存也远小于dict套dict
 def load_data():
-    if os.path.exists(Config.DATA_FILE):
-        with open(Config.DATA_FILE, 'r', encoding='utf-8') as f:
-            return {int(k): v for k, v in json.load(f).items()}
-    return {}
+    actual = np.zeros(Config.END_MONTH + 1)
+    diff = np.zeros_like(actual)
+    present = np.zeros_like(actual, dtype=bool)
+    # 直接try/open：比先exists()再open少一次stat系统调用，也没有TOCTOU竞态
+    try:
+        with open(Config.DATA_FILE, 'rb') as f:
+            raw = orjson.loads(f.read())
+    except FileNotFoundError:
+        return actual, diff, present
+    if 'months' in raw:
+        # 列式格式：orjson解析 + asarray显式dtype + 花式索引散布，纯C路径
+        months = np.asarray(raw['months'], dtype=np.int16)
+        actual[months] = np.asarray(raw['actual'], dtype=np.float64)
+        diff[months] = np.asarray(raw['diff'], dtype=np.float64)
+        present[months] = True
+    elif 'actual' in raw:
+        # 兼容旧版稠密 {'actual': [...], 'present': [...]} 格式
+        actual = np.asarray(raw['actual'], dtype=np.float64)
+        present = np.asarray(raw['present'], dtype=bool)
+        diff = np.where(present, actual - Config.MONTHLY_TARGET, 0.0)
+    else:
+        # 兼容旧版 {月份: {...}} 格式的数据文件
+        for k, rec in raw.items():
+            m = int(k)
+            actual[m] = rec['actual_profit']
+            diff[m] = rec['performance_diff']
+            present[m] = True
+    return actual, diff, present
+
+def _to_columnar(actual, diff, present):
+    # 磁盘上只存已录入的行，按列组织，加载时无需逐键转换
+    months = np.flatnonzero(present)
+    return {
+        'months': months.tolist(),
+        'actual': actual[months].tolist(),
+        'diff': diff[months].tolist(),
+    }
+
+def save_data(actual, diff, present):
+    # 一次os.write写入整块bytes，fsync后原子替换，崩溃时不会留下半个文件
+    blob = orjson.dumps(_to_columnar(actual, diff, present), option=orjson.OPT_INDENT_2)
+    tmp = Config.DATA_FILE + '.tmp'
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        os.write(fd, blob)
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+    os.replace(tmp, Config.DATA_FILE)
+
+def recalculate_totals(actual, diff, present):
+    # 全量重算只在加载时调用一次；保存路径上累计值是增量维护的
+    # 每列只做一次掩码提取，两个归约都在C层完成
+    profits = actual[present]
+    diffs = diff[present]
+    # abs()而不是取负：没有低于目标的月份时空sum取负会得到-0.0，显示成"-0.00"
+    return float(profits.sum()), float(abs(diffs[diffs < 0].sum()))
+
+@st.cache_data
+def build_records_df(months, profits, diffs):
+    # st.cache_data按参数内容哈希：数据没变时直接命中，跳过DataFrame构造和类型推断
+    return pd.DataFrame({
+        "月份": months,
+        "实际利润 (元)": profits,
+        "月度目标 (元)": np.full_like(profits, Config.MONTHLY_TARGET),
+        "月度绩效 (元)": diffs
+    })
 
-def save_data(records):
-    with open(Config.DATA_FILE, 'w', encoding='utf-8') as f:
-        json.dump(records, f, ensure_ascii=False, indent=4)
+# 可选月份只依赖Config常量，在模块导入时构造一次，避免每次rerun重建
+_MONTH_RANGE = range(Config.START_MONTH, Config.END_MONTH + 1)
+
+# 预先绑定format方法，缓存未命中时也省去每次构造格式化逻辑的开销
+_fmt_currency = "{:,.2f}".format
+
+@functools.lru_cache(maxsize=128)
+def format_currency(amount):
+    # rerun之间金额往往没变，缓存格式化结果，命中时只是一次dict查找
+    return _fmt_currency(amount)
 
 # --- 主应用界面 ---
 st.set_page_config(page_title="业绩跟踪程序", layout="wide")
 st.title(f"📈 {Config.START_YEAR}年度业绩与绩效跟踪程序")
 
 # --- 使用Session State来管理数据 ---
-# 如果 'records' 不在会话内存中，说明是第一次加载，从文件读取
-if 'records' not in st.session_state:
-    st.session_state['records'] = load_data()
+# 如果 'actual' 不在会话内存中，说明是第一次加载，从文件读取
+# 累计值只在首次加载时全量计算一次(向量化归约)，之后在保存时增量维护，
+# 避免每次rerun都遍历全部记录
+if 'actual' not in st.session_state:
+    actual, diff, present = load_data()
+    st.session_state['actual'] = actual
+    st.session_state['diff'] = diff
+    st.session_state['present'] = present
+    st.session_state['cum_profit'], st.session_state['total_deductions'] = \
+        recalculate_totals(actual, diff, present)
+    # 记录已录入的最大月份，之后在保存时O(1)维护，不再每次扫描
+    st.session_state['last_month'] = int(np.flatnonzero(present).max()) if present.any() else 0
 
 # --- 侧边栏用于输入 ---
 st.sidebar.header("数据录入/修改")
-all_months = [f"{m}月" for m in range(Config.START_MONTH, Config.END_MONTH + 1)]
 
 # 计算默认选中的月份
-# 如果有记录，默认选中下一个月；否则选中第一个月
-if st.session_state['records']:
-    next_month_index = len(st.session_state['records']) % len(all_months)
+# 如果有记录，默认选中最后录入月份的下一个月；否则选中第一个月
+last_month = st.session_state['last_month']
+if last_month:
+    next_month_index = (last_month + 1 - Config.START_MONTH) % len(_MONTH_RANGE)
 else:
     next_month_index = 0
 
-selected_month_str = st.sidebar.selectbox("选择月份", all_months, index=next_month_index)
-profit_input = st.sidebar.number_input(f"输入 {selected_month_str} 利润 (万元)", min_value=-1000.0, step=1.0, format="%.2f")
+# 选项直接用int月份，format_func只负责显示，省去保存时的字符串解析
+selected_month = st.sidebar.selectbox("选择月份", _MONTH_RANGE, index=next_month_index, format_func=lambda m: f"{m}月")
+profit_input = st.sidebar.number_input(f"输入 {selected_month}月 利润 (万元)", min_value=-1000.0, step=1.0, format="%.2f")
 
 if st.sidebar.button("💾 保存/更新", use_container_width=True):
-    month = int(selected_month_str.replace('月',''))
+    month = selected_month
     actual_profit = profit_input * 10000
     performance_diff = actual_profit - Config.MONTHLY_TARGET
-    
-    # 直接更新会话内存中的数据
-    st.session_state['records'][month] = {
-        "actual_profit": actual_profit,
-        "performance_diff": performance_diff
-    }
+
+    # 增量维护累计值：只结算本月新旧差额，O(1)，不再全量重算
+    had_record = bool(st.session_state['present'][month])
+    old_profit = float(st.session_state['actual'][month]) if had_record else 0.0
+    old_diff = float(st.session_state['diff'][month]) if had_record else 0.0
+    st.session_state['cum_profit'] += actual_profit - old_profit
+    if had_record and old_diff < 0:
+        st.session_state['total_deductions'] -= abs(old_diff)
+    if performance_diff < 0:
+        st.session_state['total_deductions'] += abs(performance_diff)
+
+    # 直接更新会话内存中的数据：三次标量写入
+    st.session_state['actual'][month] = actual_profit
+    st.session_state['diff'][month] = performance_diff
+    st.session_state['present'][month] = True
+    st.session_state['last_month'] = max(st.session_state['last_month'], month)
     # 将更新后的内存数据保存到文件
-    save_data(st.session_state['records'])
-    st.sidebar.success(f"{selected_month_str} 数据已保存！") # 在这里，因为我们用了session state，success消息通常不会引起错误
+    save_data(st.session_state['actual'], st.session_state['diff'], st.session_state['present'])
+    st.sidebar.success(f"{selected_month}月 数据已保存！") # 在这里，因为我们用了session state，success消息通常不会引起错误
     # 如果想更保险，也可以换成 st.rerun()
 
 # --- 主面板用于显示 ---
-# 直接从会话内存中读取数据来展示，不再需要每次都计算
-records_to_display = st.session_state['records']
-cumulative_profit = sum(rec['actual_profit'] for rec in records_to_display.values())
-total_deductions = sum(abs(rec['performance_diff']) for rec in records_to_display.values() if rec['performance_diff'] < 0)
+# 记录数在保存分支之后统计，保存当次rerun就能渲染明细表和年终核算
+n_records = int(st.session_state['present'].sum())
+# 直接读取增量维护的累计值，rerun时不再遍历记录
+cumulative_profit = st.session_state['cum_profit']
+total_deductions = st.session_state['total_deductions']
 remaining_to_target = Config.ANNUAL_TARGET - cumulative_profit
 
 # KPI指标卡
 col1, col2, col3 = st.columns(3)
 # ... (这部分显示逻辑和之前完全一样) ...
-col1.metric("累计利润", f"{cumulative_profit:,.2f} 元")
-col2.metric("年度目标差距", f"{remaining_to_target:,.2f} 元", delta=f"{cumulative_profit - Config.ANNUAL_TARGET:,.2f}", delta_color="normal")
-col3.metric("累计绩效扣减", f"{total_deductions:,.2f} 元")
+col1.metric("累计利润", f"{format_currency(cumulative_profit)} 元")
+col2.metric("年度目标差距", f"{format_currency(remaining_to_target)} 元", delta=format_currency(cumulative_profit - Config.ANNUAL_TARGET), delta_color="normal")
+col3.metric("累计绩效扣减", f"{format_currency(total_deductions)} 元")
 
 
-# ... (后续的表格显示和年终总结代码和之前完全一样, 只是数据源是 records_to_display) ...
+# ... (后续的表格显示和年终总结代码和之前完全一样, 只是数据源换成了SoA数组) ...
 st.markdown("---")
 st.subheader("月度数据详情")
-if records_to_display:
-    df_data = []
-    for m in sorted(records_to_display.keys()):
-        rec = records_to_display[m]
-        df_data.append({
-            "月份": f"{m}月",
-            "实际利润 (元)": rec['actual_profit'],
-            "月度目标 (元)": Config.MONTHLY_TARGET,
-            "月度绩效 (元)": rec['performance_diff']
-        })
-    df = pd.DataFrame(df_data)
+if n_records:
+    # 明细表交给st.cache_data：数据没变时命中缓存，变了自动按内容失效重建
+    present = st.session_state['present']
+    months = np.flatnonzero(present).astype(np.int16)  # 下标即月份，天然有序
+    df = build_records_df(months, st.session_state['actual'][present], st.session_state['diff'][present])
     st.dataframe(df.style.format("{:,.2f}", subset=["实际利润 (元)", "月度目标 (元)", "月度绩效 (元)"]), use_container_width=True)
 
-if len(records_to_display) >= Config.END_MONTH - Config.START_MONTH + 1:
+if n_records >= Config.END_MONTH - Config.START_MONTH + 1:
     #... (年终总结逻辑不变) ...
     st.subheader("🏆 年终奖金核算")
     if cumulative_profit >= Config.ANNUAL_TARGET:
@@ -109,9 +199,9 @@ if len(records_to_display) >= Config.END_MONTH - Config.START_MONTH + 1:
         total_bonus = clawback + surplus
         st.success(f"恭喜！已达成年度目标！")
         st.markdown(f"""
-        - **补发扣减绩效**: <font color='green'>{clawback:,.2f} 元</font>
-        - **超额达成奖励**: <font color='green'>{surplus:,.2f} 元</font>
-        - **年终总奖励合计**: <font color='blue' style='font-weight:bold;'>{total_bonus:,.2f} 元</font>
+        - **补发扣减绩效**: <font color='green'>{format_currency(clawback)} 元</font>
+        - **超额达成奖励**: <font color='green'>{format_currency(surplus)} 元</font>
+        - **年终总奖励合计**: <font color='blue' style='font-weight:bold;'>{format_currency(total_bonus)} 元</font>
         """, unsafe_allow_html=True)
     else:
         st.error("未能达成年度利润目标，不补发扣减绩效。")
\ No newline at end of file